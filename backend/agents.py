@@ -1,117 +1,295 @@
 import os
+import groq
+import httpx
 from langchain_groq import ChatGroq
-from typing import List, Dict, Any
-from models import ExpenditureEntry, ExpenditureAnalysis, InsightResponse
-from collections import defaultdict
+from typing import Dict, Any, AsyncIterator
+from models import ExpenditureColumns, ExpenditureAnalysis, InsightResponse
+import numpy as np
+from numba import njit
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-import json
+import logging
+import time
+import orjson
+from json_repair import repair_json
+from streaming import IncrementalJsonParser
+
+logger = logging.getLogger("savify")
+
+# Read once at import; a missing key fails app startup instead of the first request
+GROQ_API_KEY = os.environ["GROQ_API_KEY"]
+
+# Shared Groq client: one connection pool (and warm TLS sessions) for every agent.
+# All agent calls are async; HTTP/2 multiplexes concurrent requests over one connection.
+_GROQ_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+GROQ_CLIENT = ChatGroq(
+    api_key=GROQ_API_KEY,
+    model="llama-3.3-70b-versatile",
+    http_client=httpx.Client(http2=True, limits=_GROQ_LIMITS),
+    http_async_client=httpx.AsyncClient(http2=True, limits=_GROQ_LIMITS)
+)
+
+class LLMUnavailableError(RuntimeError):
+    """Raised instead of calling the LLM while the circuit breaker is open"""
+
+# Provider-side failures (timeouts, connection errors, 429, 5xx); anything else is a
+# problem with a single request and must not fail every other caller
+_PROVIDER_FAILURES = (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError)
+
+class LLMCircuitBreaker:
+    """After an LLM failure, fail fast for a short cooldown instead of waiting out provider timeouts"""
+
+    def __init__(self, cooldown: float = 5.0):
+        self.cooldown = cooldown
+        self._last_llm_failure_ts = float("-inf")
+
+    def check(self):
+        if time.monotonic() - self._last_llm_failure_ts < self.cooldown:
+            raise LLMUnavailableError("LLM calls suspended after a recent failure")
+
+    def record_failure(self, error: Exception):
+        # Short-circuited calls (LLMUnavailableError) don't extend the outage window
+        if isinstance(error, _PROVIDER_FAILURES):
+            self._last_llm_failure_ts = time.monotonic()
+
+# Shared by every agent: one provider, one outage state
+LLM_BREAKER = LLMCircuitBreaker()
+
+# Static system prompts are kept byte-identical across calls and every dynamic
+# field goes in the user turn, so the provider can reuse the cached prompt prefix.
+EXPENDITURE_SYSTEM_PROMPT = """You are a financial analyst. You will be given a user's financial data:
+total spending, a category breakdown and a set of spending patterns.
+
+Please provide a brief analysis summary."""
+
+INSIGHTS_SYSTEM_PROMPT = """You are a financial analyst. You will be given a user's financial data
+(total spending, category breakdown, spending patterns and user context)
+and must provide insights.
+
+Please provide a JSON response with:
+1. "insights": List of 3-5 key insights about spending behavior
+2. "recommendations": List of 3-5 actionable recommendations
+3. "financial_score": Score from 1-100 based on spending health
+4. "summary": Brief overall summary
+
+Format as valid JSON only."""
+
+# Prompt templates and LCEL chains are built once at import, not per request
+_EXPENDITURE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", EXPENDITURE_SYSTEM_PROMPT),
+    ("user", """Analyze expenditure
+
+        Total Spending: ${total}
+        Category Breakdown: {category_breakdown}
+        Spending Patterns: {spending_patterns}""")
+])
+_EXPENDITURE_CHAIN = _EXPENDITURE_PROMPT | GROQ_CLIENT | StrOutputParser()
+
+_INSIGHTS_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", INSIGHTS_SYSTEM_PROMPT),
+    ("user", """Generate financial insights
+
+        Total Spending: {total_spending}
+        Category Breakdown: {category_breakdown}
+        Spending Patterns: {spending_patterns}
+        User Context: {user_context}""")
+])
+_INSIGHTS_CHAIN = _INSIGHTS_PROMPT | GROQ_CLIENT | StrOutputParser()
+
+def _extract_json_object(response: str) -> Dict[str, Any]:
+    """Parse the JSON object in an LLM reply, repairing truncated or malformed output"""
+    start = response.find('{')
+    if start < 0:
+        raise ValueError("No JSON object in response")
+
+    # Fast path: a complete, well-formed object
+    end = response.rfind('}') + 1
+    if end > start:
+        try:
+            data = orjson.loads(response[start:end])
+            if isinstance(data, dict):
+                return data
+        except orjson.JSONDecodeError:
+            pass
+
+    # Slow path: close unterminated strings/arrays/objects so partial fields survive
+    data = repair_json(response[start:], return_objects=True)
+    if not isinstance(data, dict):
+        raise ValueError("Could not recover a JSON object from response")
+    return data
+
+def _templated_summary(total: float, categories: Dict[str, float], patterns: Dict[str, Any]) -> str:
+    """Deterministic summary for inputs too small to need the LLM"""
+    if not categories:
+        return "No spending was recorded in the provided data."
+
+    top = patterns["highest_category"]
+    top_amount = categories[top]
+    count = patterns["transaction_count"]
+    share = f", {top_amount / total:.0%} of the total" if total > 0 else ""
+    category_word = "category" if len(categories) == 1 else "categories"
+    transaction_word = "transaction" if count == 1 else "transactions"
+    return (
+        f"You spent ${total:.2f} across {len(categories)} {category_word}, "
+        f"dominated by {top} (${top_amount:.2f}{share}). "
+        f"That is {count} {transaction_word} averaging ${patterns['avg_transaction']:.2f} each."
+    )
+
+@njit(cache=True, fastmath=True)
+def _aggregate(codes: np.ndarray, amounts: np.ndarray, n_cats: int):
+    """Per-category sums, grand total and index of the largest category (-1 if empty)"""
+    sums = np.zeros(n_cats)
+    total = 0.0
+    for i in range(amounts.size):
+        sums[codes[i]] += amounts[i]
+        total += amounts[i]
+
+    argmax = -1
+    for c in range(n_cats):
+        if argmax < 0 or sums[c] > sums[argmax]:
+            argmax = c
+    return sums, total, argmax
+
+def warm_up_kernels():
+    """Compile (or load from the on-disk cache) the Numba kernels before the first request needs them"""
+    _aggregate(np.zeros(1, dtype=np.int64), np.zeros(1), 1)
 
 class ExpenditureAnalyzer:
     def __init__(self):
-        self.client = ChatGroq(api_key=os.getenv("GROQ_API_KEY"), model="llama-3.3-70b-versatile")
+        self.chain = _EXPENDITURE_CHAIN
 
-    def analyze_expenditure(self, entries: List[ExpenditureEntry]) -> ExpenditureAnalysis:
-        total_spending = sum(entry.amount for entry in entries)
+    async def analyze_expenditure(self, columns: ExpenditureColumns) -> ExpenditureAnalysis:
+        analysis = self.compute_analysis(columns)
+        analysis.analysis_summary = await self.generate_summary(analysis)
+        return analysis
+
+    def compute_analysis(self, columns: ExpenditureColumns) -> ExpenditureAnalysis:
+        """Structured analysis without the LLM summary (analysis_summary is left empty)"""
+        count = len(columns)
+        amounts = np.asarray(columns.amounts, dtype=np.float64)
+        
+        # Encode categories to int codes (first-seen order) in one Python pass
+        category_codes: Dict[str, int] = {}
+        codes = np.fromiter(
+            (category_codes.setdefault(category, len(category_codes)) for category in columns.categories),
+            dtype=np.int64, count=count
+        )
         
-        # Category breakdown
-        category_breakdown = defaultdict(float)
-        for entry in entries:
-            category_breakdown[entry.category] += entry.amount
+        # Category breakdown, total and top category in a single compiled loop
+        sums, total_spending, top_code = _aggregate(codes, amounts, len(category_codes))
+        category_breakdown = {category: float(sums[code]) for category, code in category_codes.items()}
+        category_names = list(category_codes)
         
         # Spending patterns
         spending_patterns = {
-            "avg_transaction": total_spending / len(entries) if entries else 0,
-            "highest_category": max(category_breakdown.items(), key=lambda x: x[1])[0] if category_breakdown else "",
-            "transaction_count": len(entries),
+            "avg_transaction": total_spending / count if count else 0,
+            "highest_category": category_names[top_code] if top_code >= 0 else "",
+            "transaction_count": count,
             "categories_count": len(category_breakdown)
         }
         
-        # Generate analysis summary
-        analysis_summary = self._generate_analysis_summary(total_spending, category_breakdown, spending_patterns)
-        print("Analysis Summary:", analysis_summary)
-        
-        return ExpenditureAnalysis(
+        return ExpenditureAnalysis.model_construct(
             total_spending=total_spending,
-            category_breakdown=dict(category_breakdown),
+            category_breakdown=category_breakdown,
             spending_patterns=spending_patterns,
-            analysis_summary=analysis_summary
+            analysis_summary=""
         )
+
+    async def generate_summary(self, analysis: ExpenditureAnalysis) -> str:
+        analysis_summary = await self._generate_analysis_summary(
+            analysis.total_spending, analysis.category_breakdown, analysis.spending_patterns
+        )
+        logger.debug("Analysis Summary: %s", analysis_summary)
+        return analysis_summary
     
-    def _generate_analysis_summary(self, total: float, categories: Dict[str, float], patterns: Dict[str, Any]):
-        prompt = ChatPromptTemplate.from_messages([
-            ("system",
-            """You are a financial analyst. You will analyze the following financial data:
+    async def _generate_analysis_summary(self, total: float, categories: Dict[str, float], patterns: Dict[str, Any]):
+        if self._use_template(categories, patterns):
+            return _templated_summary(total, categories, patterns)
 
-                Total Spending: ${total}
-                Category Breakdown: {category_breakdown}
-                Spending Patterns: {spending_patterns}
+        inputs = self._summary_inputs(total, categories, patterns)
+        try:
+            LLM_BREAKER.check()
+            return await self.chain.ainvoke(inputs)
+        except Exception as e:
+            LLM_BREAKER.record_failure(e)
+            logger.warning("LLM analysis summary generation failed: %s", e)
+            return "The expenditure analysis has been completed."
 
-                Please provide a brief analysis summary."""
-                            ),
-                            ("user", "Analyze expenditure")
-                        ])
+    async def stream_summary(self, analysis: ExpenditureAnalysis) -> AsyncIterator[str]:
+        """Yield the LLM analysis summary as it is generated"""
+        if self._use_template(analysis.category_breakdown, analysis.spending_patterns):
+            yield _templated_summary(analysis.total_spending, analysis.category_breakdown, analysis.spending_patterns)
+            return
 
+        inputs = self._summary_inputs(analysis.total_spending, analysis.category_breakdown, analysis.spending_patterns)
         try:
-            chain = prompt | self.client | StrOutputParser()
-            response = chain.invoke({
-                "total": f"{total:.2f}",
-                "category_breakdown": json.dumps(categories, indent=2),
-                "spending_patterns": json.dumps(patterns, indent=2)
-            })
-            return response
+            LLM_BREAKER.check()
+            async for chunk in self.chain.astream(inputs):
+                yield chunk
         except Exception as e:
-            print(f"LLM analysis summary generation failed: {str(e)}")
-            return "The expenditure analysis has been completed."
+            LLM_BREAKER.record_failure(e)
+            logger.warning("LLM analysis summary streaming failed: %s", e)
+            yield "The expenditure analysis has been completed."
+
+    def _use_template(self, categories: Dict[str, float], patterns: Dict[str, Any]) -> bool:
+        # A single category or a handful of transactions reads just as well from a template
+        return len(categories) <= 1 or patterns["transaction_count"] < 5
+
+    def _summary_inputs(self, total: float, categories: Dict[str, float], patterns: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            "total": f"{total:.2f}",
+            "category_breakdown": orjson.dumps(categories).decode(),
+            "spending_patterns": orjson.dumps(patterns).decode()
+        }
 
 class InsightsAgent:
     def __init__(self):
-        self.client = ChatGroq(api_key=os.getenv("GROQ_API_KEY"), model="llama-3.3-70b-versatile")
+        self.chain = _INSIGHTS_CHAIN
     
-    def generate_insights(self, analysis: ExpenditureAnalysis, user_context: str = "") -> InsightResponse:
-        prompt = ChatPromptTemplate.from_messages([
-            ("system",
-        """You are a financial analyst. You will analyze the following financial data and provide insights:
-        
-            Total Spending: {total_spending}
-            Category Breakdown: {category_breakdown}
-            Spending Patterns: {spending_patterns}
-            Analysis Summary: {analysis_summary}
-            User Context: {user_context}
-
-            Please provide a JSON response with:
-            1. "insights": List of 3-5 key insights about spending behavior
-            2. "recommendations": List of 3-5 actionable recommendations
-            3. "financial_score": Score from 1-100 based on spending health
-            4. "summary": Brief overall summary
-
-            Format as valid JSON only."""
-                    ),
-                        ("user", "Generate financial insights")
-                    ])
-        
+    async def generate_insights(self, analysis: ExpenditureAnalysis, user_context: str = "") -> InsightResponse:
+        inputs = self._insights_inputs(analysis, user_context)
         try:
-            chain = prompt | self.client | StrOutputParser()
-            response = chain.invoke({
-                "total_spending": f"${analysis.total_spending:.2f}",
-                "category_breakdown": json.dumps(analysis.category_breakdown, indent=2),
-                "spending_patterns": json.dumps(analysis.spending_patterns, indent=2),
-                "analysis_summary": analysis.analysis_summary,
-                "user_context": user_context
-            })
-            print("LLM Insights Response:", response)
-            return self._parse_llm_response(response)
-    
+            LLM_BREAKER.check()
+            response = await self.chain.ainvoke(inputs)
         except Exception as e:
+            LLM_BREAKER.record_failure(e)
             return self._fallback_insights(analysis)
+        
+        logger.debug("LLM Insights Response: %s", response)
+        return self._parse_llm_response(response)
+    
+    async def stream_insights(self, analysis: ExpenditureAnalysis, user_context: str = "") -> AsyncIterator[Dict[str, Any]]:
+        """Yield the partially parsed insights object each time the LLM streams more of it"""
+        parser = IncrementalJsonParser()
+        partial: Dict[str, Any] = {}
+        inputs = self._insights_inputs(analysis, user_context)
+        try:
+            LLM_BREAKER.check()
+            async for chunk in self.chain.astream(inputs):
+                partial = parser.feed(chunk)
+                yield partial
+        except Exception as e:
+            LLM_BREAKER.record_failure(e)
+            logger.warning("LLM insights streaming failed: %s", e)
+            if not partial:
+                yield self._fallback_insights(analysis).model_dump()
+            return
+        
+        # Same outcome as _parse_llm_response for a reply with no usable JSON object
+        if not partial:
+            yield self._unparsed_insights().model_dump()
+
+    def _insights_inputs(self, analysis: ExpenditureAnalysis, user_context: str) -> Dict[str, str]:
+        return {
+            "total_spending": f"${analysis.total_spending:.2f}",
+            "category_breakdown": orjson.dumps(analysis.category_breakdown).decode(),
+            "spending_patterns": orjson.dumps(analysis.spending_patterns).decode(),
+            "user_context": user_context
+        }
     
     def _parse_llm_response(self, response: str) -> InsightResponse:
         try:
-            # Extract JSON from response
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            json_str = response[start:end]
-            data = json.loads(json_str)
+            data = _extract_json_object(response)
             
             return InsightResponse(
                 insights=data.get("insights", []),
@@ -120,12 +298,15 @@ class InsightsAgent:
                 summary=data.get("summary", "Analysis completed")
             )
         except:
-            return InsightResponse(
-                insights=["Unable to parse AI response"],
-                recommendations=["Please try again"],
-                financial_score=50,
-                summary="Error processing AI response"
-            )
+            return self._unparsed_insights()
+    
+    def _unparsed_insights(self) -> InsightResponse:
+        return InsightResponse(
+            insights=["Unable to parse AI response"],
+            recommendations=["Please try again"],
+            financial_score=50,
+            summary="Error processing AI response"
+        )
     
     def _fallback_insights(self, analysis: ExpenditureAnalysis) -> InsightResponse:
         insights = [
@@ -1,16 +1,25 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import uvicorn
 from typing import List
 import os
 import sys
+import asyncio
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from dotenv import load_dotenv
-from models import ExpenditureEntry, InsightRequest,ChatRequest, ChatResponse, FullAnalysisRequest
-from master_agent import MasterAgent
 
+# Load .env before importing the agents: the shared Groq client is built at import time
 load_dotenv()
 
+from models import ExpenditureEntry, ExpenditureColumns, InsightRequest,ChatRequest, ChatResponse, FullAnalysisRequest
+from master_agent import MasterAgent
+from agents import warm_up_kernels
+
 app = FastAPI(title="Financial AI System", version="1.0.0")
 
 # CORS middleware
@@ -22,9 +31,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Log records are queued and written by a background thread so request handlers never block on stdout
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(_log_queue, logging.StreamHandler(), respect_handler_level=True)
+
+@app.on_event("startup")
+async def start_logging():
+    logger = logging.getLogger("savify")
+    logger.setLevel(os.getenv("LOG_LEVEL", "WARNING").upper())
+    logger.addHandler(QueueHandler(_log_queue))
+    logger.propagate = False
+    _log_listener.start()
+
+@app.on_event("shutdown")
+async def stop_logging():
+    _log_listener.stop()
+
 # Initialize master agent (handles all routing)
 master_agent = MasterAgent()
 
+@app.on_event("startup")
+async def warm_up():
+    # Load the embedding model before serving traffic rather than on the first request;
+    # a failed load only disables the semantic cache
+    await asyncio.to_thread(master_agent.semantic_cache.load)
+    # Numba compiles lazily on first call; do it here (once per worker) instead of inside a request
+    await asyncio.to_thread(warm_up_kernels)
+
 @app.get("/")
 async def root():
     return {"message": "Financial AI System API"}
@@ -40,7 +73,9 @@ async def analyze_expenditure(entries: List[ExpenditureEntry]):
             message="Analyze my spending data",
             expenditure_data=entries
         )
-        response = master_agent.process_user_input(request)
+        # Columnar copy built once here; downstream aggregation reads plain arrays
+        columns = ExpenditureColumns.from_entries(entries)
+        response = await master_agent.process_user_input_async(request, columns)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
@@ -53,7 +88,7 @@ async def generate_insights(request: InsightRequest):
             message="Generate financial insights and recommendations",
             user_context=request.user_context
         )
-        response = master_agent.process_user_input(chat_request)
+        response = await master_agent.process_user_input_async(chat_request)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Insights generation failed: {str(e)}")
@@ -70,7 +105,8 @@ async def full_analysis(request: FullAnalysisRequest):
             user_context=request.user_context,
             expenditure_data=request.entries
         )
-        response = master_agent.process_user_input(chat_request)
+        columns = ExpenditureColumns.from_entries(request.entries)
+        response = await master_agent.process_user_input_async(chat_request, columns)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Full analysis failed: {str(e)}")
@@ -79,7 +115,31 @@ async def full_analysis(request: FullAnalysisRequest):
 async def chat(request: ChatRequest):
     """Master agent endpoint for handling all types of financial queries"""
     try:
-        response = master_agent.process_user_input(request)
+        response = await master_agent.process_user_input_async(request)
         return response
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming variant of /chat - response text is sent as Server-Sent Events while it is generated"""
+    try:
+        query_type, chunks = await master_agent.stream_user_input(request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
+
+    async def event_generator():
+        yield f"data: {json.dumps({'query_type': query_type.value})}\n\n"
+        async for chunk in chunks:
+            yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+@app.get("/stats")
+async def stats():
+    """Classification fast-path and cache counters for this worker"""
+    return master_agent.classification_stats()
+
+if __name__ == "__main__":
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, loop="uvloop", http="httptools", workers=2)
@@ -0,0 +1,46 @@
+import re
+from typing import Optional
+
+# Fallback classifier keywords (used when the LLM is unavailable) compiled into one alternation; each named group is a bucket.
+# Keywords match anywhere in the message, as substrings ("overspending", "reinvest"); the zero-width
+# lookahead lets matches overlap, so one keyword never hides another bucket's keyword.
+CLASSIFIER_RE = re.compile(
+    r"(?=(?:"
+    r"(?P<exp>spending|expense|expenditure|analyze|budget|spent|cost)"
+    r"|(?P<ins>insights|recommendations|advice|help|tips|improve|save)"
+    r"|(?P<tax>tax|taxation|deduction|filing|irs|refund)"
+    r"|(?P<inv>invest|investment|stocks|portfolio|returns|market)"
+    r"|(?P<rev>revenue|income|earnings|profit|salary|business)"
+    r"))",
+    re.IGNORECASE
+)
+
+# High-confidence stems for the LLM-bypass fast path; same bucket names as above.
+# The low-signal fallback words (help, cost, market, ...) are deliberately left out.
+FAST_PATH_RE = re.compile(
+    r"\b(?:"
+    r"(?P<exp>(?:spend|expense|budget)\w*)"
+    r"|(?P<ins>(?:insight|recommendation)\w*)"
+    r"|(?P<tax>tax(?!i)\w*)"
+    r"|(?P<inv>(?:invest(?!igat)|stock)\w*)"
+    r"|(?P<rev>(?:revenue|income)\w*)"
+    r")\b",
+    re.IGNORECASE
+)
+
+# Bucket names in fallback priority order
+CLASSIFIER_BUCKETS = ("exp", "ins", "tax", "inv", "rev")
+
+
+def keyword_buckets(message: str, pattern: re.Pattern = CLASSIFIER_RE) -> set:
+    """Names of every keyword bucket hit by the message, from a single regex scan"""
+    return {match.lastgroup for match in pattern.finditer(message)}
+
+
+def fallback_bucket(message: str) -> Optional[str]:
+    """Highest-priority bucket hit by the message, or None for general chat"""
+    buckets = keyword_buckets(message)
+    for bucket in CLASSIFIER_BUCKETS:
+        if bucket in buckets:
+            return bucket
+    return None
@@ -1,105 +1,456 @@
-import os
-from langchain_groq import ChatGroq
-from models import ChatRequest, ChatResponse, QueryType
-from agents import ExpenditureAnalyzer, InsightsAgent
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
+import orjson
+from sentence_transformers import SentenceTransformer
+from models import ChatRequest, ChatResponse, ExpenditureColumns, QueryType
+from streaming import INSIGHT_SECTIONS, render_new_insights
+from classifier import FAST_PATH_RE, fallback_bucket, keyword_buckets
+from agents import ExpenditureAnalyzer, InsightsAgent, GROQ_CLIENT, LLM_BREAKER
 import json
 
+logger = logging.getLogger("savify")
+
+# Bucket -> query type, in fallback priority order (see classifier.CLASSIFIER_BUCKETS)
+_CLASSIFIER_GROUPS = {
+    "exp": QueryType.EXPENDITURE_ANALYSIS,
+    "ins": QueryType.INSIGHTS_GENERATION,
+    "tax": QueryType.TAX_ADVICE,
+    "inv": QueryType.INVESTMENT_ADVICE,
+    "rev": QueryType.REVENUE_ANALYSIS,
+}
+
+# Static system prompts: dynamic fields are sent in the user turn only, so this
+# prefix stays identical across requests and can be served from the provider's prompt cache.
+CLASSIFICATION_SYSTEM_PROMPT = """Classify the user message into one of these categories:
+- expenditure_analysis: User wants to analyze spending/expenses/budget
+- insights_generation: User wants financial insights, recommendations, or advice
+- tax_advice: User asks about taxes, deductions, or tax planning
+- investment_advice: User asks about investments, stocks, or portfolio
+- revenue_analysis: User asks about income, revenue, or earnings analysis
+- general_chat: General financial questions or conversation
+
+Respond with only the category name (e.g., "expenditure_analysis")."""
+
+CLASSIFY_AND_RESPOND_SYSTEM_PROMPT = """You are a personal finance assistant. Classify the user message and answer it in one step.
+
+Categories:
+- expenditure_analysis: User wants to analyze spending/expenses/budget
+- insights_generation: User wants financial insights, recommendations, or advice
+- tax_advice: User asks about taxes, deductions, or tax planning
+- investment_advice: User asks about investments, stocks, or portfolio
+- revenue_analysis: User asks about income, revenue, or earnings analysis
+- general_chat: General financial questions or conversation
+
+Return a JSON object with two fields:
+- "query_type": one of the category names above
+- "response": your answer to the user, or null if query_type is expenditure_analysis
+
+When answering, act as a tax advisor for tax_advice, an investment advisor for investment_advice
+and a financial analyst for revenue_analysis. Provide clear, actionable advice in a conversational
+tone, include specific steps or recommendations where appropriate, and keep it practical and helpful."""
+
+GENERAL_INSIGHTS_SYSTEM_PROMPT = """The user is asking for financial insights.
+
+Provide personalized financial insights and recommendations in a conversational tone.
+Focus on actionable advice for better financial management.
+Keep it practical and helpful."""
+
+ADVICE_SYSTEM_PROMPTS = {
+    QueryType.TAX_ADVICE: "You are a tax advisor. Provide helpful tax advice and tips for the user's question. Be specific and actionable.",
+    QueryType.INVESTMENT_ADVICE: "You are an investment advisor. Provide investment guidance and strategies for the user's question. Focus on practical advice.",
+    QueryType.REVENUE_ANALYSIS: "You are a financial analyst. Provide revenue analysis and business income insights for the user's question."
+}
+
+ADVICE_INSTRUCTIONS = """Provide clear, actionable advice in a conversational tone.
+Include specific steps or recommendations where appropriate.
+Keep it practical and helpful."""
+
+GENERAL_CHAT_SYSTEM_PROMPT = """This appears to be a general financial question. Provide a helpful, conversational response
+related to personal finance, money management, or financial planning.
+Keep it friendly and informative."""
+
+
+_QUERY_MAPPING = {query_type.value: query_type for query_type in QueryType}
+
+FALLBACK_RESPONSES = {
+    QueryType.INSIGHTS_GENERATION: "Here are some general financial insights: Track your expenses regularly, set monthly budgets, and review your spending patterns to identify areas for improvement.",
+    QueryType.TAX_ADVICE: "For tax advice, consider consulting with a tax professional. Keep detailed records of your expenses and income throughout the year.",
+    QueryType.INVESTMENT_ADVICE: "For investments, consider diversifying your portfolio and investing in low-cost index funds. Always do your research before investing.",
+    QueryType.REVENUE_ANALYSIS: "To analyze revenue, track your income sources, monitor trends over time, and identify your most profitable activities.",
+    QueryType.GENERAL_CHAT: "I'm here to help with your financial questions! Feel free to ask about budgeting, investments, taxes, or any other money-related topics."
+}
+
+NO_DATA_RESPONSE = "To analyze your expenditure, I'll need your spending data. You can provide it in your next message, or I can give you general budgeting advice instead. What would you prefer?"
+
+
+def _user_turn(label: str, message: str, user_context: Optional[str]) -> str:
+    return f"""{label}: "{message}"
+User context: {user_context}"""
+
+
+def _ensure_columns(request: ChatRequest, columns: Optional[ExpenditureColumns]) -> Optional[ExpenditureColumns]:
+    if columns is None and request.expenditure_data:
+        return ExpenditureColumns.from_entries(request.expenditure_data)
+    return columns
+
+
+def _chat_messages(request: ChatRequest, query_type: QueryType) -> List[Tuple[str, str]]:
+    """System + user messages for the free-text (non-pipeline) query types"""
+    if query_type == QueryType.INSIGHTS_GENERATION:
+        return [
+            ("system", GENERAL_INSIGHTS_SYSTEM_PROMPT),
+            ("user", _user_turn("Request", request.message, request.user_context))
+        ]
+    if query_type in ADVICE_SYSTEM_PROMPTS:
+        return [
+            ("system", f"{ADVICE_SYSTEM_PROMPTS[query_type]}\n\n{ADVICE_INSTRUCTIONS}"),
+            ("user", _user_turn("User question", request.message, request.user_context))
+        ]
+    return [
+        ("system", GENERAL_CHAT_SYSTEM_PROMPT),
+        ("user", _user_turn("The user is asking", request.message, request.user_context))
+    ]
+
+
+_QUERY_TYPE_CODES = {query_type: code for code, query_type in enumerate(QueryType)}
+
+
+class SemanticCache:
+    """Reuses LLM responses for semantically similar prompts (cosine similarity on sentence embeddings)"""
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 maxsize: int = 512, threshold: float = 0.92):
+        self.model_name = model_name
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.encoder = None
+        self.disabled = False
+        self._load_lock = threading.Lock()
+        # Ring buffer: rows are overwritten oldest-first once the cache is full (FIFO eviction)
+        self._matrix = None
+        self._responses = [None] * maxsize
+        # Query type of each row, so typed lookups only match answers of that type
+        self._types = np.full(maxsize, -1, dtype=np.int8)
+        # Hash of each row's exact user context: answers are personalized, so they are only
+        # reused for an identical context, never for a merely similar one
+        self._contexts = np.zeros(maxsize, dtype=np.int64)
+        self._size = 0
+        self._next = 0
+
+    def load(self):
+        """Load the embedding model; app startup calls this so no request pays for it"""
+        with self._load_lock:
+            if self.encoder is not None or self.disabled:
+                return
+            try:
+                encoder = SentenceTransformer(self.model_name)
+            except Exception as e:
+                # The cache is only an optimization: run without it rather than fail startup
+                logger.warning("Embedding model failed to load, semantic cache disabled: %s", e)
+                self.disabled = True
+                return
+            dim = encoder.get_sentence_embedding_dimension()
+            self._matrix = np.zeros((self.maxsize, dim), dtype=np.float32)
+            self.encoder = encoder
+
+    async def embed(self, message: str) -> np.ndarray:
+        """Embed the message in a worker thread (model inference is CPU-bound and would block the event loop)"""
+        # The key is query-type agnostic so the cache can be checked before the query is classified
+        return await asyncio.to_thread(self._encode, message)
+
+    def _encode(self, message: str) -> np.ndarray:
+        self.load()
+        if self.encoder is None:
+            raise RuntimeError("semantic cache is disabled")
+        return self.encoder.encode(message, normalize_embeddings=True).astype(np.float32)
+
+    def lookup(self, query_vec: np.ndarray, user_context: Optional[str],
+               query_type: Optional[QueryType] = None) -> Optional[ChatResponse]:
+        """Return the closest cached response above the threshold for the same user context (and query_type, if given)"""
+        if self._size == 0:
+            return None
+
+        scores = self._matrix[:self._size] @ query_vec
+        scores = np.where(self._contexts[:self._size] == hash(user_context or ""), scores, -1.0)
+        if query_type is not None:
+            scores = np.where(self._types[:self._size] == _QUERY_TYPE_CODES[query_type], scores, -1.0)
+        best = int(np.argmax(scores))
+        if scores[best] > self.threshold:
+            return self._responses[best]
+        return None
+
+    def store(self, query_vec: np.ndarray, user_context: Optional[str], response: ChatResponse):
+        self._matrix[self._next] = query_vec
+        self._responses[self._next] = response
+        self._types[self._next] = _QUERY_TYPE_CODES[response.query_type]
+        self._contexts[self._next] = hash(user_context or "")
+        self._next = (self._next + 1) % self.maxsize
+        self._size = min(self._size + 1, self.maxsize)
+
 
 class MasterAgent:
     def __init__(self):
-        self.client = ChatGroq(api_key=os.getenv("GROQ_API_KEY"), model="llama-3.3-70b-versatile")
+        self.client = GROQ_CLIENT
         self.expenditure_analyzer = ExpenditureAnalyzer()
         self.insights_agent = InsightsAgent()
+        self.semantic_cache = SemanticCache()
+        # Single-call classify + answer, in Groq JSON mode
+        self.json_client = GROQ_CLIENT.bind(response_format={"type": "json_object"})
+        # Exact-match LRU cache of LLM classifications, keyed by the normalized message
+        self._classification_cache: OrderedDict = OrderedDict()
+        self._classification_cache_size = 1024
+        self.fast_path_hits = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+    async def process_user_input_async(self, request: ChatRequest,
+                                       columns: Optional[ExpenditureColumns] = None) -> ChatResponse:
+        """Main entry point - intelligently routes user queries to appropriate agents.
+
+        columns is the column-oriented copy of request.expenditure_data; it is built here if the caller did not.
+        """
+        columns = _ensure_columns(request, columns)
+        norm_msg = request.message.strip().lower()
+        query_type = self._known_classification(norm_msg, bool(request.expenditure_data))
+        query_vec = None
         
-    def process_user_input(self, request: ChatRequest) -> ChatResponse:
-        """Main entry point - intelligently routes user queries to appropriate agents"""
-        # Classify the query type using AI
-        query_type = self._classify_query(request.message)
+        if query_type is None:
+            # Without expenditure data every route is a single LLM answer, so classify and answer in one call
+            if not request.expenditure_data:
+                # Cached answers carry their query type, so a hit skips classification as well
+                cached, query_vec = await self._semantic_lookup(request)
+                if cached:
+                    return cached
+                query_type, combined = await self._classify_and_respond(request, norm_msg, query_vec)
+                if combined:
+                    return combined
+            if query_type is None:
+                # Classify the query type using AI
+                query_type = await self._classify_uncached(request.message, norm_msg)
         
         # Route to appropriate handler based on query type and available data
         if query_type == QueryType.EXPENDITURE_ANALYSIS:
             if request.expenditure_data:
-                return self._handle_expenditure_analysis(request)
+                return await self._handle_expenditure_analysis(request, columns)
             else:
                 # No data provided, ask for it or provide general advice
-                return ChatResponse(
-                    response="To analyze your expenditure, I'll need your spending data. You can provide it in your next message, or I can give you general budgeting advice instead. What would you prefer?",
+                return ChatResponse.model_construct(
+                    response=NO_DATA_RESPONSE,
                     query_type=QueryType.EXPENDITURE_ANALYSIS
                 )
         
         elif query_type == QueryType.INSIGHTS_GENERATION:
-            return self._handle_insights_request(request)
+            return await self._handle_insights_request(request, columns, query_vec)
         
         elif query_type in [QueryType.TAX_ADVICE, QueryType.INVESTMENT_ADVICE, QueryType.REVENUE_ANALYSIS]:
-            return self._handle_financial_advice(request, query_type)
+            return await self._handle_financial_advice(request, query_type, query_vec)
         
         else:
-            return self._handle_general_chat(request)
+            return await self._handle_general_chat(request, query_vec)
+
+    async def stream_user_input(self, request: ChatRequest,
+                                columns: Optional[ExpenditureColumns] = None) -> Tuple[QueryType, AsyncIterator[str]]:
+        """Streaming variant of process_user_input_async: classify, then return the response text as an async iterator"""
+        columns = _ensure_columns(request, columns)
+        query_type = await self._classify_query(request.message, bool(request.expenditure_data))
+        
+        if query_type == QueryType.EXPENDITURE_ANALYSIS:
+            if request.expenditure_data:
+                return query_type, self._stream_expenditure_analysis(columns)
+            return query_type, self._stream_text(NO_DATA_RESPONSE)
+        
+        if query_type == QueryType.INSIGHTS_GENERATION and request.expenditure_data:
+            return query_type, self._stream_insights(request, columns)
+        
+        return query_type, self._stream_chat(request, query_type)
+
+    async def _stream_text(self, text: str) -> AsyncIterator[str]:
+        yield text
+
+    async def _stream_expenditure_analysis(self, columns: ExpenditureColumns) -> AsyncIterator[str]:
+        analysis = self.expenditure_analyzer.compute_analysis(columns)
+        
+        yield (
+            f"I've analyzed your expenditure data:\n\n"
+            f"• Total Spending: ${analysis.total_spending:.2f}\n"
+            f"• Categories: {len(analysis.category_breakdown)}\n"
+            f"• Top Category: {analysis.spending_patterns.get('highest_category', 'N/A')}\n\n"
+        )
+        async for chunk in self.expenditure_analyzer.stream_summary(analysis):
+            yield chunk
+
+    async def _stream_insights(self, request: ChatRequest, columns: ExpenditureColumns) -> AsyncIterator[str]:
+        """Render insight bullets progressively as the JSON reply streams in"""
+        analysis = self.expenditure_analyzer.compute_analysis(columns)
+        
+        yield "Based on your spending data, here are my insights:\n\n"
+        emitted = {field: 0 for field, _ in INSIGHT_SECTIONS}
+        partial: Dict[str, Any] = {}
+        async for partial in self.insights_agent.stream_insights(analysis, request.user_context):
+            text = render_new_insights(partial, emitted)
+            if text:
+                yield text
+        
+        yield f"\n**Financial Score: {partial.get('financial_score', 50)}/100**\n\n"
+        yield partial.get("summary", "Analysis completed")
+
+    async def _stream_chat(self, request: ChatRequest, query_type: QueryType) -> AsyncIterator[str]:
+        cached, query_vec = await self._semantic_lookup(request, query_type)
+        if cached:
+            yield cached.response
+            return
+        
+        parts = []
+        try:
+            LLM_BREAKER.check()
+            async for chunk in self.client.astream(_chat_messages(request, query_type)):
+                parts.append(chunk.content)
+                yield chunk.content
+        except Exception as e:
+            LLM_BREAKER.record_failure(e)
+            logger.warning("Streaming error: %s", e)
+            if not parts:
+                yield FALLBACK_RESPONSES[query_type]
+            return
+        
+        if query_vec is not None:
+            self.semantic_cache.store(query_vec, request.user_context, ChatResponse.model_construct(response="".join(parts), query_type=query_type))
     
-    def _classify_query(self, message: str) -> QueryType:
-        """Use AI to intelligently classify user queries"""
-        classification_prompt = f"""
-        Classify the following user message into one of these categories:
-        - expenditure_analysis: User wants to analyze spending/expenses/budget
-        - insights_generation: User wants financial insights, recommendations, or advice
-        - tax_advice: User asks about taxes, deductions, or tax planning
-        - investment_advice: User asks about investments, stocks, or portfolio
-        - revenue_analysis: User asks about income, revenue, or earnings analysis
-        - general_chat: General financial questions or conversation
-        
-        User message: "{message}"
-        
-        Respond with only the category name (e.g., "expenditure_analysis").
+    async def _semantic_lookup(self, request: ChatRequest,
+                               query_type: Optional[QueryType] = None) -> Tuple[Optional[ChatResponse], Optional[np.ndarray]]:
+        """Embed the request once (off the event loop) and look it up in the semantic cache.
+
+        Cache errors are logged and treated as a miss with no vector, so the caller skips the store.
         """
-        
+        if self.semantic_cache.disabled:
+            return None, None
         try:
-            response = self.client.invoke(classification_prompt)
-            classification = response.content.strip().lower()
-            print(f"AI Classification: {classification}")
-            
-            # Map to QueryType enum
-            query_mapping = {
-                "expenditure_analysis": QueryType.EXPENDITURE_ANALYSIS,
-                "insights_generation": QueryType.INSIGHTS_GENERATION,
-                "tax_advice": QueryType.TAX_ADVICE,
-                "investment_advice": QueryType.INVESTMENT_ADVICE,
-                "revenue_analysis": QueryType.REVENUE_ANALYSIS,
-                "general_chat": QueryType.GENERAL_CHAT
-            }
-            
-            return query_mapping.get(classification, QueryType.GENERAL_CHAT)
-            
+            query_vec = await self.semantic_cache.embed(request.message)
+            return self.semantic_cache.lookup(query_vec, request.user_context, query_type), query_vec
+        except Exception as e:
+            logger.warning("Semantic cache lookup failed: %s", e)
+            return None, None
+
+    async def _classify_query(self, message: str, has_data: bool = False) -> QueryType:
+        """Use AI to intelligently classify user queries"""
+        norm_msg = message.strip().lower()
+        query_type = self._known_classification(norm_msg, has_data)
+        if query_type is None:
+            query_type = await self._classify_uncached(message, norm_msg)
+        return query_type
+
+    def _known_classification(self, norm_msg: str, has_data: bool = False) -> Optional[QueryType]:
+        """Classification available without an LLM call: keyword fast path, then the exact-match cache"""
+        # Unambiguous keyword hits (exactly one bucket) skip the LLM entirely
+        buckets = keyword_buckets(norm_msg, FAST_PATH_RE)
+        # "spend"/"budget" alone don't separate an analysis request from an advice question
+        # ("how should I spend my bonus?"); without data to analyze, let the LLM decide
+        if len(buckets) == 1 and (has_data or "exp" not in buckets):
+            self.fast_path_hits += 1
+            return _CLASSIFIER_GROUPS[buckets.pop()]
+
+        query_type = self._classification_cache.get(norm_msg)
+        if query_type is None:
+            self.cache_misses += 1
+            return None
+        self.cache_hits += 1
+        self._classification_cache.move_to_end(norm_msg)
+        return query_type
+
+    def _remember_classification(self, norm_msg: str, query_type: QueryType):
+        self._classification_cache[norm_msg] = query_type
+        self._classification_cache.move_to_end(norm_msg)
+        if len(self._classification_cache) > self._classification_cache_size:
+            self._classification_cache.popitem(last=False)
+
+    async def _classify_uncached(self, message: str, norm_msg: str) -> QueryType:
+        try:
+            query_type = await self._classify_with_llm(norm_msg)
         except Exception as e:
-            print(f"Classification error: {e}")
-            # Fallback to keyword-based classification
+            LLM_BREAKER.record_failure(e)
+            logger.warning("Classification error: %s", e)
+            # Fallback to keyword-based classification (not cached)
             return self._fallback_classify(message)
+        self._remember_classification(norm_msg, query_type)
+        return query_type
+
+    def classification_stats(self) -> dict:
+        """Hit/miss counters for the classification fast path and cache"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "fast_path_hits": self.fast_path_hits,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_size": len(self._classification_cache),
+            "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0
+        }
+
+    async def _classify_with_llm(self, message: str) -> QueryType:
+        """Classify a normalized message with the LLM; errors propagate so they are never cached"""
+        messages = [
+            ("system", CLASSIFICATION_SYSTEM_PROMPT),
+            ("user", f'User message: "{message}"')
+        ]
+        
+        LLM_BREAKER.check()
+        response = await self.client.ainvoke(messages)
+        classification = response.content.strip().lower()
+        logger.debug("AI Classification: %s", classification)
+        
+        return _QUERY_MAPPING.get(classification, QueryType.GENERAL_CHAT)
+
+    async def _classify_and_respond(self, request: ChatRequest, norm_msg: str,
+                                    query_vec: Optional[np.ndarray]) -> Tuple[Optional[QueryType], Optional[ChatResponse]]:
+        """One round-trip classification + answer; a None response means the caller should route normally"""
+        messages = [
+            ("system", CLASSIFY_AND_RESPOND_SYSTEM_PROMPT),
+            ("user", _user_turn("User message", request.message, request.user_context))
+        ]
+        
+        try:
+            LLM_BREAKER.check()
+            response = await self.json_client.ainvoke(messages)
+        except Exception as e:
+            LLM_BREAKER.record_failure(e)
+            logger.warning("Combined classification error: %s", e)
+            return None, None
+        
+        try:
+            data = orjson.loads(response.content)
+            logger.debug("Combined AI Response: %s", response.content)
+        except orjson.JSONDecodeError as e:
+            logger.warning("Combined classification returned invalid JSON: %s", e)
+            return None, None
+        if not isinstance(data, dict):
+            logger.warning("Combined classification returned a non-object JSON reply")
+            return None, None
+        
+        query_type = _QUERY_MAPPING.get(str(data.get("query_type", "")).strip().lower(), QueryType.GENERAL_CHAT)
+        self._remember_classification(norm_msg, query_type)
+        
+        if query_type == QueryType.EXPENDITURE_ANALYSIS:
+            return query_type, ChatResponse.model_construct(response=NO_DATA_RESPONSE, query_type=query_type)
+        
+        answer = data.get("response")
+        if not isinstance(answer, str) or not answer.strip():
+            return query_type, None
+        
+        chat_response = ChatResponse.model_construct(response=answer, query_type=query_type)
+        if query_vec is not None:
+            self.semantic_cache.store(query_vec, request.user_context, chat_response)
+        return query_type, chat_response
     
     def _fallback_classify(self, message: str) -> QueryType:
         """Fallback keyword-based classification"""
-        message_lower = message.lower()
-        
-        expenditure_keywords = ["spending", "expense", "expenditure", "analyze", "budget", "spent", "cost"]
-        insights_keywords = ["insights", "recommendations", "advice", "help", "tips", "improve", "save"]
-        tax_keywords = ["tax", "taxation", "deduction", "filing", "irs", "refund"]
-        investment_keywords = ["invest", "investment", "stocks", "portfolio", "returns", "market"]
-        revenue_keywords = ["revenue", "income", "earnings", "profit", "salary", "business"]
-        
-        if any(keyword in message_lower for keyword in expenditure_keywords):
-            return QueryType.EXPENDITURE_ANALYSIS
-        elif any(keyword in message_lower for keyword in insights_keywords):
-            return QueryType.INSIGHTS_GENERATION
-        elif any(keyword in message_lower for keyword in tax_keywords):
-            return QueryType.TAX_ADVICE
-        elif any(keyword in message_lower for keyword in investment_keywords):
-            return QueryType.INVESTMENT_ADVICE
-        elif any(keyword in message_lower for keyword in revenue_keywords):
-            return QueryType.REVENUE_ANALYSIS
-        else:
-            return QueryType.GENERAL_CHAT
+        return _CLASSIFIER_GROUPS.get(fallback_bucket(message), QueryType.GENERAL_CHAT)
     
-    def _handle_expenditure_analysis(self, request: ChatRequest) -> ChatResponse:
+    async def _handle_expenditure_analysis(self, request: ChatRequest, columns: ExpenditureColumns) -> ChatResponse:
         try:
-            analysis = self.expenditure_analyzer.analyze_expenditure(request.expenditure_data)
+            analysis = await self.expenditure_analyzer.analyze_expenditure(columns)
             
             response_text = f"I've analyzed your expenditure data:\n\n"
             response_text += f"• Total Spending: ${analysis.total_spending:.2f}\n"
@@ -107,28 +458,35 @@ class MasterAgent:
             response_text += f"• Top Category: {analysis.spending_patterns.get('highest_category', 'N/A')}\n\n"
             response_text += analysis.analysis_summary
             
-            return ChatResponse(
+            return ChatResponse.model_construct(
                 response=response_text,
                 query_type=QueryType.EXPENDITURE_ANALYSIS,
-                data=analysis.dict()
+                data=analysis.model_dump(mode="json")
             )
         except Exception as e:
-            return ChatResponse(
+            return ChatResponse.model_construct(
                 response=f"Sorry, I couldn't analyze your expenditure data: {str(e)}",
                 query_type=QueryType.EXPENDITURE_ANALYSIS
             )
     
-    def _handle_insights_request(self, request: ChatRequest) -> ChatResponse:
-        """Handle insights generation - use existing InsightsAgent if expenditure data available"""
+    async def _handle_insights_request(self, request: ChatRequest,
+                                       columns: Optional[ExpenditureColumns] = None,
+                                       query_vec: Optional[np.ndarray] = None) -> ChatResponse:
+        """Handle insights generation - use existing InsightsAgent if expenditure data available.
+
+        query_vec is passed when the caller already embedded the request and missed the semantic cache.
+        """
         
         # If expenditure data is provided, use the full pipeline
         if request.expenditure_data:
             try:
-                # First analyze expenditure
-                analysis = self.expenditure_analyzer.analyze_expenditure(request.expenditure_data)
-                
-                # Then generate insights using the InsightsAgent
-                insights_response = self.insights_agent.generate_insights(analysis, request.user_context)
+                # Structured analysis is cheap; the summary and insights LLM calls run concurrently
+                analysis = self.expenditure_analyzer.compute_analysis(columns)
+                summary, insights_response = await asyncio.gather(
+                    self.expenditure_analyzer.generate_summary(analysis),
+                    self.insights_agent.generate_insights(analysis, request.user_context)
+                )
+                analysis.analysis_summary = summary
                 
                 # Format response
                 response_text = f"Based on your spending data, here are my insights:\n\n"
@@ -141,105 +499,101 @@ class MasterAgent:
                     response_text += f"• {rec}\n"
                 response_text += f"\n{insights_response.summary}"
                 
-                return ChatResponse(
+                return ChatResponse.model_construct(
                     response=response_text,
                     query_type=QueryType.INSIGHTS_GENERATION,
                     data={
-                        "analysis": analysis.dict(),
-                        "insights": insights_response.dict()
+                        "analysis": analysis.model_dump(mode="json"),
+                        "insights": insights_response.model_dump(mode="json")
                     }
                 )
             except Exception as e:
-                return ChatResponse(
+                return ChatResponse.model_construct(
                     response=f"I had trouble analyzing your data, but here's some general advice: {str(e)}",
                     query_type=QueryType.INSIGHTS_GENERATION
                 )
         
         # If no expenditure data, provide general insights using AI
-        prompt = f"""
-        The user is asking for financial insights: "{request.message}"
-        User context: {request.user_context}
+        messages = _chat_messages(request, QueryType.INSIGHTS_GENERATION)
         
-        Provide personalized financial insights and recommendations in a conversational tone.
-        Focus on actionable advice for better financial management.
-        Keep it practical and helpful.
-        """
+        if query_vec is None:
+            cached, query_vec = await self._semantic_lookup(request, QueryType.INSIGHTS_GENERATION)
+            if cached:
+                return cached
         
         try:
-            response = self.client.invoke(prompt)
-            print(f"Insights AI Response: {response.content}")
-            
-            return ChatResponse(
-                response=response.content,
-                query_type=QueryType.INSIGHTS_GENERATION
-            )
+            LLM_BREAKER.check()
+            response = await self.client.ainvoke(messages)
         except Exception as e:
-            print(f"Insights generation error: {e}")
-            return ChatResponse(
-                response="Here are some general financial insights: Track your expenses regularly, set monthly budgets, and review your spending patterns to identify areas for improvement.",
+            LLM_BREAKER.record_failure(e)
+            logger.warning("Insights generation error: %s", e)
+            return ChatResponse.model_construct(
+                response=FALLBACK_RESPONSES[QueryType.INSIGHTS_GENERATION],
                 query_type=QueryType.INSIGHTS_GENERATION
             )
-    
-    def _handle_financial_advice(self, request: ChatRequest, query_type: QueryType) -> ChatResponse:
-        advice_prompts = {
-            QueryType.TAX_ADVICE: "You are a tax advisor. Provide helpful tax advice and tips for the user's question. Be specific and actionable.",
-            QueryType.INVESTMENT_ADVICE: "You are an investment advisor. Provide investment guidance and strategies for the user's question. Focus on practical advice.",
-            QueryType.REVENUE_ANALYSIS: "You are a financial analyst. Provide revenue analysis and business income insights for the user's question."
-        }
-
-        prompt = f"""
-        {advice_prompts[query_type]}
         
-        User question: "{request.message}"
-        User context: {request.user_context}
+        logger.debug("Insights AI Response: %s", response.content)
+        chat_response = ChatResponse.model_construct(
+            response=response.content,
+            query_type=QueryType.INSIGHTS_GENERATION
+        )
+        if query_vec is not None:
+            self.semantic_cache.store(query_vec, request.user_context, chat_response)
+        return chat_response
+    
+    async def _handle_financial_advice(self, request: ChatRequest, query_type: QueryType,
+                                       query_vec: Optional[np.ndarray] = None) -> ChatResponse:
+        messages = _chat_messages(request, query_type)
         
-        Provide clear, actionable advice in a conversational tone.
-        Include specific steps or recommendations where appropriate.
-        Keep it practical and helpful.
-        """
+        if query_vec is None:
+            cached, query_vec = await self._semantic_lookup(request, query_type)
+            if cached:
+                return cached
         
         try:
-            response = self.client.invoke(prompt)
-            print(f"Financial Advice AI Response: {response.content}")
-            
-            return ChatResponse(
-                response=response.content,
-                query_type=query_type
-            )
+            LLM_BREAKER.check()
+            response = await self.client.ainvoke(messages)
         except Exception as e:
-            print(f"Financial advice error: {e}")
-            fallback_responses = {
-                QueryType.TAX_ADVICE: "For tax advice, consider consulting with a tax professional. Keep detailed records of your expenses and income throughout the year.",
-                QueryType.INVESTMENT_ADVICE: "For investments, consider diversifying your portfolio and investing in low-cost index funds. Always do your research before investing.",
-                QueryType.REVENUE_ANALYSIS: "To analyze revenue, track your income sources, monitor trends over time, and identify your most profitable activities."
-            }
-            
-            return ChatResponse(
-                response=fallback_responses.get(query_type, "I'm here to help with your financial questions."),
+            LLM_BREAKER.record_failure(e)
+            logger.warning("Financial advice error: %s", e)
+            return ChatResponse.model_construct(
+                response=FALLBACK_RESPONSES[query_type],
                 query_type=query_type
             )
+        
+        logger.debug("Financial Advice AI Response: %s", response.content)
+        chat_response = ChatResponse.model_construct(
+            response=response.content,
+            query_type=query_type
+        )
+        if query_vec is not None:
+            self.semantic_cache.store(query_vec, request.user_context, chat_response)
+        return chat_response
     
-    def _handle_general_chat(self, request: ChatRequest) -> ChatResponse:
-        prompt = f"""
-        The user is asking: "{request.message}"
-        User context: {request.user_context}
-        
-        This appears to be a general financial question. Provide a helpful, conversational response
-        related to personal finance, money management, or financial planning.
-        Keep it friendly and informative.
-        """
+    async def _handle_general_chat(self, request: ChatRequest, query_vec: Optional[np.ndarray] = None) -> ChatResponse:
+        messages = _chat_messages(request, QueryType.GENERAL_CHAT)
+        
+        if query_vec is None:
+            cached, query_vec = await self._semantic_lookup(request, QueryType.GENERAL_CHAT)
+            if cached:
+                return cached
         
         try:
-            response = self.client.invoke(prompt)
-            print(f"General Chat AI Response: {response.content}")
-            
-            return ChatResponse(
-                response=response.content,
-                query_type=QueryType.GENERAL_CHAT
-            )
+            LLM_BREAKER.check()
+            response = await self.client.ainvoke(messages)
         except Exception as e:
-            print(f"General chat error: {e}")
-            return ChatResponse(
-                response="I'm here to help with your financial questions! Feel free to ask about budgeting, investments, taxes, or any other money-related topics.",
+            LLM_BREAKER.record_failure(e)
+            logger.warning("General chat error: %s", e)
+            return ChatResponse.model_construct(
+                response=FALLBACK_RESPONSES[QueryType.GENERAL_CHAT],
                 query_type=QueryType.GENERAL_CHAT
-            )
\ No newline at end of file
+            )
+        
+        logger.debug("General Chat AI Response: %s", response.content)
+        chat_response = ChatResponse.model_construct(
+            response=response.content,
+            query_type=QueryType.GENERAL_CHAT
+        )
+        if query_vec is not None:
+            self.semantic_cache.store(query_vec, request.user_context, chat_response)
+        return chat_response
\ No newline at end of file
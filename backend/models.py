@@ -1,8 +1,13 @@
-from pydantic import BaseModel
+from array import array
+from dataclasses import dataclass
+from pydantic import BaseModel, ConfigDict
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from enum import Enum
 
+# Shared settings: no re-validation on attribute assignment (agents fill fields in after construction)
+_MODEL_CONFIG = ConfigDict(ser_json_bytes='utf8', validate_assignment=False)
+
 class QueryType(str, Enum):
     EXPENDITURE_ANALYSIS = "expenditure_analysis"
     INSIGHTS_GENERATION = "insights_generation"
@@ -12,37 +17,67 @@ class QueryType(str, Enum):
     GENERAL_CHAT = "general_chat"
 
 class ExpenditureEntry(BaseModel):
+    model_config = _MODEL_CONFIG
+
     amount: float
     category: str
     description: str
     date: datetime
 
 class ExpenditureAnalysis(BaseModel):
+    model_config = _MODEL_CONFIG
+
     total_spending: float
     category_breakdown: Dict[str, float]
     spending_patterns: Dict[str, Any]
     analysis_summary: str
 
 class InsightRequest(BaseModel):
+    model_config = _MODEL_CONFIG
+
     analysis_data: ExpenditureAnalysis
     user_context: str = ""
 
 class InsightResponse(BaseModel):
+    model_config = _MODEL_CONFIG
+
     insights: List[str]
     recommendations: List[str]
     financial_score: int
     summary: str
 
 class ChatRequest(BaseModel):
+    model_config = _MODEL_CONFIG
+
     message: str
     user_context: Optional[str] = ""
     expenditure_data: Optional[List[ExpenditureEntry]] = None
 
 class ChatResponse(BaseModel):
+    model_config = _MODEL_CONFIG
+
     response: str
     query_type: QueryType
     data: Optional[Dict[str, Any]] = None
 
 class FullAnalysisRequest(BaseModel):
+    model_config = _MODEL_CONFIG
+
     entries: List[ExpenditureEntry]
-    user_context: str = ""
\ No newline at end of file
+    user_context: str = ""
+
+@dataclass
+class ExpenditureColumns:
+    """Column-oriented (SoA) view of expenditure entries, built once at the API boundary"""
+    amounts: array
+    categories: List[str]
+
+    @classmethod
+    def from_entries(cls, entries: List[ExpenditureEntry]) -> "ExpenditureColumns":
+        return cls(
+            amounts=array('d', (entry.amount for entry in entries)),
+            categories=[entry.category for entry in entries]
+        )
+
+    def __len__(self) -> int:
+        return len(self.categories)
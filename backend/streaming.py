@@ -0,0 +1,78 @@
+import json
+from typing import Any, Dict
+
+
+class IncrementalJsonParser:
+    """Streamed JSON object parser; the buffer is re-parsed only when a value completes, never per token"""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._start = -1
+        self._closers = []
+        self._in_string = False
+        self._escape = False
+        self._result: Dict[str, Any] = {}
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        self._text += chunk
+        boundary = None
+
+        while self._pos < len(self._text) and (self._start < 0 or self._closers):
+            char = self._text[self._pos]
+            self._pos += 1
+
+            # Skip any preamble before the root object
+            if self._start < 0:
+                if char == "{":
+                    self._start = self._pos - 1
+                    self._closers.append("}")
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._closers.append("}")
+            elif char == "[":
+                self._closers.append("]")
+            elif char in "}]":
+                self._closers.pop()
+                boundary = (self._pos, list(self._closers))
+            elif char == ",":
+                boundary = (self._pos - 1, list(self._closers))
+
+        if boundary is not None:
+            end, closers = boundary
+            try:
+                parsed = json.loads(self._text[self._start:end] + "".join(reversed(closers)))
+            except ValueError:
+                # Malformed model output: keep the last good result
+                return self._result
+            if isinstance(parsed, dict):
+                self._result = parsed
+        return self._result
+
+
+INSIGHT_SECTIONS = (("insights", "**Key Insights:**\n"), ("recommendations", "\n**Recommendations:**\n"))
+
+
+def render_new_insights(partial: Dict[str, Any], emitted: Dict[str, int]) -> str:
+    """Markdown bullets for list items completed since the last call; updates emitted in place"""
+    text = ""
+    for field, heading in INSIGHT_SECTIONS:
+        items = partial.get(field)
+        if not isinstance(items, list) or len(items) <= emitted[field]:
+            continue
+        if emitted[field] == 0:
+            text += heading
+        for item in items[emitted[field]:]:
+            text += f"• {item}\n"
+        emitted[field] = len(items)
+    return text
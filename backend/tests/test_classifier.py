@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from classifier import FAST_PATH_RE, fallback_bucket, keyword_buckets
+
+
+class FallbackBucketTest(unittest.TestCase):
+    def test_priority_order(self):
+        cases = {
+            "Help me cut my spending": "exp",          # exp beats ins
+            "Any tips for my tax refund?": "ins",      # ins beats tax
+            "Tax on my investment returns": "tax",     # tax beats inv
+            "Should I invest my salary?": "inv",       # inv beats rev
+            "How is my business revenue?": "rev",
+        }
+        for message, bucket in cases.items():
+            self.assertEqual(fallback_bucket(message), bucket, message)
+
+    def test_keywords_match_as_substrings(self):
+        self.assertEqual(fallback_bucket("I keep overspending"), "exp")
+        self.assertEqual(fallback_bucket("Should I reinvest dividends?"), "inv")
+        self.assertEqual(fallback_bucket("TAXATION rules"), "tax")
+
+    def test_no_keyword_is_general_chat(self):
+        self.assertIsNone(fallback_bucket("Hello there"))
+        self.assertIsNone(fallback_bucket(""))
+
+    def test_every_bucket_hit_is_reported(self):
+        self.assertEqual(keyword_buckets("budget advice on stocks"), {"exp", "ins", "inv"})
+
+
+class FastPathTest(unittest.TestCase):
+    def fast_path(self, message):
+        return keyword_buckets(message.lower(), FAST_PATH_RE)
+
+    def test_high_confidence_stems_hit(self):
+        cases = {
+            "Show me an insight": "ins",
+            "Give me recommendations": "ins",
+            "Which stock should I buy?": "inv",
+            "Is investing worth it?": "inv",
+            "How do I file my taxes?": "tax",
+            "Analyze my expenses": "exp",
+            "Track my income": "rev",
+        }
+        for message, bucket in cases.items():
+            self.assertEqual(self.fast_path(message), {bucket}, message)
+
+    def test_lookalikes_and_low_signal_words_miss(self):
+        for message in ("How much is a taxi to the airport?", "Help me investigate a charge",
+                        "What is the cost of living in Pune?", "Any help?", "How is the market?"):
+            self.assertEqual(self.fast_path(message), set(), message)
+
+    def test_mixed_buckets_are_ambiguous(self):
+        self.assertEqual(self.fast_path("Tax on stock gains"), {"tax", "inv"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from streaming import IncrementalJsonParser, INSIGHT_SECTIONS, render_new_insights
+
+INSIGHTS_REPLY = "Here is your analysis:\n" + json.dumps({
+    "insights": ["Food is 60% of spending", "Weekend spend, \"mostly\" dining [out]", "Rent is fixed"],
+    "recommendations": ["Cook at home twice a week", "Set a $200 dining cap"],
+    "financial_score": 72,
+    "summary": "Healthy overall, with room to trim dining."
+}, indent=2)
+
+
+def stream(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def render_stream(chunks):
+    """Feed chunks through the parser and renderer the way MasterAgent._stream_insights does"""
+    parser = IncrementalJsonParser()
+    emitted = {field: 0 for field, _ in INSIGHT_SECTIONS}
+    pieces = []
+    partial = {}
+    for chunk in chunks:
+        partial = parser.feed(chunk)
+        text = render_new_insights(partial, emitted)
+        if text:
+            pieces.append(text)
+    return pieces, partial
+
+
+class IncrementalJsonParserTest(unittest.TestCase):
+    def test_full_stream_matches_json_loads(self):
+        for size in (1, 3, 17, len(INSIGHTS_REPLY)):
+            parser = IncrementalJsonParser()
+            for chunk in stream(INSIGHTS_REPLY, size):
+                result = parser.feed(chunk)
+            self.assertEqual(result, json.loads(INSIGHTS_REPLY[INSIGHTS_REPLY.index("{"):]))
+
+    def test_partial_values_are_never_exposed(self):
+        expected = json.loads(INSIGHTS_REPLY[INSIGHTS_REPLY.index("{"):])
+        parser = IncrementalJsonParser()
+        for chunk in stream(INSIGHTS_REPLY, 2):
+            result = parser.feed(chunk)
+            for field in ("insights", "recommendations"):
+                for item in result.get(field, []):
+                    self.assertIn(item, expected[field])
+            if "summary" in result:
+                self.assertEqual(result["summary"], expected["summary"])
+
+    def test_truncated_stream_keeps_completed_fields(self):
+        cut = INSIGHTS_REPLY[:INSIGHTS_REPLY.index("room to trim")]
+        parser = IncrementalJsonParser()
+        for chunk in stream(cut, 5):
+            result = parser.feed(chunk)
+        self.assertEqual(len(result["insights"]), 3)
+        self.assertEqual(len(result["recommendations"]), 2)
+        self.assertEqual(result["financial_score"], 72)
+        self.assertNotIn("summary", result)
+
+    def test_no_object_yields_empty_result(self):
+        parser = IncrementalJsonParser()
+        self.assertEqual(parser.feed("Sorry, I can't help with that."), {})
+
+
+class RenderNewInsightsTest(unittest.TestCase):
+    def test_chunked_stream_renders_each_bullet_once_in_order(self):
+        expected = (
+            "**Key Insights:**\n"
+            "• Food is 60% of spending\n"
+            "• Weekend spend, \"mostly\" dining [out]\n"
+            "• Rent is fixed\n"
+            "\n**Recommendations:**\n"
+            "• Cook at home twice a week\n"
+            "• Set a $200 dining cap\n"
+        )
+        for size in (1, 4, 32):
+            pieces, partial = render_stream(stream(INSIGHTS_REPLY, size))
+            self.assertEqual("".join(pieces), expected)
+            self.assertEqual(partial["summary"], "Healthy overall, with room to trim dining.")
+
+    def test_bullets_are_rendered_progressively(self):
+        pieces, _ = render_stream(stream(INSIGHTS_REPLY, 1))
+        # Insights heading, one piece per insight, then the recommendations heading with the first bullet
+        self.assertEqual(pieces[0], "**Key Insights:**\n• Food is 60% of spending\n")
+        self.assertEqual(len(pieces), 5)
+
+    def test_missing_or_empty_lists_render_nothing(self):
+        emitted = {field: 0 for field, _ in INSIGHT_SECTIONS}
+        self.assertEqual(render_new_insights({"insights": [], "financial_score": 50}, emitted), "")
+        self.assertEqual(render_new_insights({}, emitted), "")
+
+
+if __name__ == "__main__":
+    unittest.main()